@@ -1,5 +1,6 @@
 import logging
 from collections import defaultdict
+from itertools import islice
 
 from sqlalchemy import Integer, and_, func
 from sqlalchemy.dialects.postgresql import ARRAY
@@ -30,6 +31,7 @@ __returned_keys = (
 JR_FIELDS = {key: getattr(Cluster, key) for key in __returned_keys}
 JR_SQLA_FIELDS = [getattr(Cluster, key) for key in __returned_keys]
 JR_PAGE_LENGTH = 30
+PREFETCH_CHUNK_SIZE = 16
 
 
 class ClusterController(AbstractController):
@@ -37,6 +39,8 @@ class ClusterController(AbstractController):
 
     # Clusterizer EP
     def clusterize_pending_articles(self):
+        from jarr.lib.content_generator import prefetch_pages
+
         results = []
         actrl = ArticleController(self.user_id)
         art_count = actrl.read(cluster_id=None).count()
@@ -46,18 +50,27 @@ class ClusterController(AbstractController):
         WORKER_BATCH.labels(worker_type="clusterizer").observe(art_count)
         clusterizer = Clusterizer(self.user_id)
         feed_ids, fctrl = set(), FeedController(self.user_id)
-        for article in actrl.read(cluster_id=None):
-            filter_result = process_filters(
-                article.feed.filters,
-                {
-                    "tags": article.tags,
-                    "title": article.title,
-                    "link": article.link,
-                },
+        articles = iter(actrl.read(cluster_id=None))
+        # prefetching chunk by chunk so that only a few pages are held
+        while chunk := list(islice(articles, PREFETCH_CHUNK_SIZE)):
+            # only truncated feeds' articles get their page fetched by enhance
+            prefetch_pages(
+                article.content_generator
+                for article in chunk
+                if article.feed.truncated_content
             )
-            result = clusterizer.main(article, filter_result).id
-            results.append(result)
-            feed_ids.add(article.feed_id)
+            for article in chunk:
+                filter_result = process_filters(
+                    article.feed.filters,
+                    {
+                        "tags": article.tags,
+                        "title": article.title,
+                        "link": article.link,
+                    },
+                )
+                result = clusterizer.main(article, filter_result).id
+                results.append(result)
+                feed_ids.add(article.feed_id)
         for feed_id in feed_ids:
             fctrl.update_unread_count(feed_id)
         return results
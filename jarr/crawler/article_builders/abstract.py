@@ -2,7 +2,7 @@ import logging
 
 import requests
 from jarr.bootstrap import conf
-from jarr.lib.content_generator import YOUTUBE_RE, is_embedded_link
+from jarr.lib.content_generator import is_embedded_link
 from jarr.lib.enums import ArticleType
 from jarr.lib.filter import FiltersAction, process_filters
 from jarr.lib.url_cleaners import clean_urls, remove_utm_tags
@@ -130,13 +130,10 @@ class AbstractArticleBuilder:
         yield self.article
 
     def enhance(self):
-        if is_embedded_link(self.article['link']):
+        if yt_match := is_embedded_link(self.article['link']):
             self.article['article_type'] = ArticleType.embedded
-            try:  # let's not fetch youtube page, avoid consent page redirect
-                video_id = YOUTUBE_RE.match(self.article['link']).group(5)
-                self.article['link_hash'] = self.to_hash(video_id)
-            except IndexError:
-                pass
+            # let's not fetch youtube page, avoid consent page redirect
+            self.article['link_hash'] = self.to_hash(yt_match.group(1))
             yield from self._all_articles()
             return
         head = self._head(self.article['link'])
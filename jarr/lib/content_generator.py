@@ -1,31 +1,145 @@
+import json
 import logging
 import re
 import urllib.parse
-from functools import lru_cache
-
-from typing import Optional
-from goose3 import Goose
-from jarr.bootstrap import conf
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from itertools import chain
+
+from typing import NamedTuple, Optional
+from advocate.exceptions import UnacceptableAddressException
+from requests.exceptions import InvalidSchema, InvalidURL, MissingSchema
+from jarr.bootstrap import REDIS_CONN, conf
 from jarr.controllers.article import to_vector
 from jarr.lib.enums import ArticleType, FeedType
 from jarr.lib.url_cleaners import remove_utm_tags
-from jarr.lib.utils import clean_lang
+from jarr.lib.utils import clean_lang, default_handler, digest, jarr_get
 
 logger = logging.getLogger(__name__)
-IMG_ALT_MAX_LENGTH = 100
+JARR_EXTRACT_KEY = "jarr.extract.%s"
+EXTRACT_EXPIRE = 60 * 60
+EXTRACT_FAILED_EXPIRE = 10 * 60
+EXTRACT_MAX_SIZE = 256 * 1024  # characters of a serialized extraction
+# only the video id, 11 characters long, is captured
 YOUTUBE_RE = re.compile(
-    r"^((?:https?:)?\/\/)?((?:www|m)\.)?((?:youtube\.com|youtu.be))"
-    r"(\/(?:[\w\-]+\?v=|embed\/|v\/)?)([\w\-]+)(\S+)?$"
+    r"^(?:(?:https?:)?//)?(?:(?:www|m)\.)?"
+    r"(?:youtube\.com/(?:watch\?(?:\S*&)?v=|embed/|v/)|youtu\.be/)"
+    r"([\w-]{11})(?:[?&#]\S*)?$"
 )
 
 
-def is_embedded_link(link):
+@lru_cache(maxsize=4096)
+def _match_youtube(link):
     return YOUTUBE_RE.match(link)
 
 
+def is_embedded_link(link):
+    # cheap check sparing the regex to the vast majority of links, matches
+    # are cached as builders and generators test the same links repeatedly
+    return "youtu" in link and _match_youtube(link)
+
+
 def get_embedded_id(link):
-    if match := YOUTUBE_RE.match(link):
-        return match.group(5)
+    if match := is_embedded_link(link):
+        return match.group(1)
+
+
+@lru_cache(maxsize=None)
+def get_goose(user_agent):
+    """Return a Goose instance shared by every extraction with user_agent."""
+    # imported here, the API only needs this module for migrate_content
+    from goose3 import Goose
+
+    return Goose({"browser_user_agent": user_agent})
+
+
+CONTENT_GENERATORS: dict = {}
+
+
+def register(cls):
+    """Map cls to the feed or article type it generates content for."""
+    if cls.feed_type is not None:
+        CONTENT_GENERATORS[cls.feed_type] = cls
+    if cls.article_type is not None:
+        CONTENT_GENERATORS[cls.article_type] = cls
+    return cls
+
+
+def _fetch(link):
+    """Download link through jarr_get, returning (response, error)."""
+    try:
+        response = jarr_get(link)
+        response.raise_for_status()
+        return response, None
+    except Exception as error:
+        logger.error("couldn't fetch %r: %r", link, error)
+        return None, error
+
+
+def _is_lasting_error(error):
+    """Tell whether fetching the same link again would fail the same way."""
+    if isinstance(error, (UnacceptableAddressException, InvalidSchema,
+                          InvalidURL, MissingSchema)):
+        return True
+    response = getattr(error, "response", None)
+    return (response is not None and 400 <= response.status_code < 500
+            and response.status_code not in {408, 429})
+
+
+def prefetch_pages(generators, max_workers=8):
+    """Download concurrently, once per link, the pages generators need."""
+    to_fetch = defaultdict(list)
+    for gen in generators:
+        if gen.needs_page and not gen.load_extracted():
+            to_fetch[gen.article.link].append(gen)
+    if not to_fetch:
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(_fetch, list(to_fetch))
+        for gens, (response, error) in zip(to_fetch.values(), results):
+            for gen in gens:
+                gen.set_prefetched(response, error)
+
+
+class ExtractedPage(NamedTuple):
+    """What is kept of a Goose extraction to vectorize and display it."""
+
+    title: str
+    tags: list
+    cleaned_text: str
+    meta_lang: Optional[str]
+    final_url: str
+    top_node_raw_html: Optional[str]
+
+
+def extract(link, raw_html):
+    """Run Goose on raw_html, returning (infos, ExtractedPage) or None."""
+    goose = get_goose(conf.crawler.user_agent)
+    try:
+        page = goose.extract(url=link, raw_html=raw_html)
+    except Exception as error:
+        msg = "something wrong happened while trying to extract %r: %r"
+        logger.error(msg, link, error)
+        return None
+    if not page:
+        return None
+    lang = page.opengraph.get("locale") or page.meta_lang
+    keywords = (kw.strip() for kw in page.meta_keywords.split(","))
+    infos = {
+        "lang": clean_lang(lang),
+        "link": page.final_url,
+        "tags": {tag for tag in chain(page.tags, keywords) if tag},
+        "title": page.title,
+    }
+    return infos, ExtractedPage(
+        title=page.title,
+        tags=list(page.tags),
+        cleaned_text=page.cleaned_text,
+        meta_lang=page.meta_lang,
+        final_url=page.final_url,
+        top_node_raw_html=page.top_node_raw_html,
+    )
 
 
 class ContentGenerator:
@@ -35,30 +149,82 @@ class ContentGenerator:
     def __init__(self, article):
         self.article = article
         self._page = None
+        self._raw_html = None
+        self._fetched_url = None
+        self._extract_attempted = False
         self.extracted_infos = {}
 
+    @property
+    def needs_page(self):
+        return not self._extract_attempted and self._raw_html is None
+
+    def set_prefetched(self, response=None, error=None):
+        """Hand over the page downloaded for this generator, or the error."""
+        if response is not None:
+            self._raw_html, self._fetched_url = response.content, response.url
+        elif error is not None:
+            self._fetch_failed(error)
+
+    def _fetch_failed(self, error):
+        # transient errors aren't shared: articles with that link are only
+        # clusterized once and would never get their page fetched
+        if not _is_lasting_error(error):
+            return
+        self._extract_attempted = True
+        REDIS_CONN.set(self._extract_key, json.dumps(None),
+                       ex=EXTRACT_FAILED_EXPIRE)
+
+    @property
+    def _extract_key(self):
+        return JARR_EXTRACT_KEY % digest(self.article.link)
+
+    def load_extracted(self):
+        """Reuse the extraction stored in redis for the same link, if any."""
+        cached = REDIS_CONN.get(self._extract_key)
+        if cached is None:
+            return False
+        self._extract_attempted = True
+        extracted = json.loads(cached)
+        if extracted is not None:
+            infos, page = extracted
+            self.extracted_infos = dict(infos, tags=set(infos["tags"]))
+            self._page = ExtractedPage(**page)
+        return True
+
     def _get_goose(self):
-        goose = Goose({"browser_user_agent": conf.crawler.user_agent})
-        try:
-            self._page = goose.extract(self.article.link)
-        except Exception as error:
-            msg = "something wrong happened while trying to fetch %r: %r"
-            logger.error(msg, self.article.link, error)
-        if not self._page:
+        if self.load_extracted():
+            self._raw_html = None  # extracted for another article already
+            return self._page is not None
+        self._extract_attempted = True
+        if self._raw_html is None:
+            response, error = _fetch(self.article.link)
+            if response is None:
+                self._fetch_failed(error)
+                return False
+            self._raw_html, self._fetched_url = response.content, response.url
+        extracted = None
+        if self._raw_html:  # Goose would fetch the page itself otherwise
+            extracted = extract(self._fetched_url, self._raw_html)
+        self._raw_html = None  # parsed, no need to hold the page any longer
+        if extracted is None:
             return False
-        lang = self._page.opengraph.get("locale") or self._page.meta_lang
-        self.extracted_infos["lang"] = clean_lang(lang)
-        self.extracted_infos["link"] = self._page.final_url
-        keywords = set(self._page.meta_keywords.split(", "))
-        self.extracted_infos["tags"] = set(self._page.tags).union(keywords)
-        self.extracted_infos["title"] = self._page.title
+        self.extracted_infos, self._page = extracted
+        cached = json.dumps([self.extracted_infos, self._page._asdict()],
+                            default=default_handler)
+        if len(cached) <= EXTRACT_MAX_SIZE:  # sparing the redis shared by all
+            REDIS_CONN.set(self._extract_key, cached, ex=EXTRACT_EXPIRE)
         return True
 
-    def get_vector(self):
-        if self._page is None:
+    @cached_property
+    def _vector(self):
+        if not self._extract_attempted:
             self._get_goose()
         if self._page and self.extracted_infos:
             return to_vector(self.extracted_infos, self._page)
+        return None
+
+    def get_vector(self):
+        return self._vector
 
     @staticmethod
     def generate():
@@ -81,6 +247,7 @@ class ContentGenerator:
 
 
 class MediaContentGenerator(ContentGenerator):
+    needs_page = False
 
     @staticmethod
     def get_vector():
@@ -95,44 +262,46 @@ class MediaContentGenerator(ContentGenerator):
         return content
 
 
+@register
 class ImageContentGenerator(MediaContentGenerator):
     article_type = ArticleType.image
 
 
+@register
 class AudioContentGenerator(MediaContentGenerator):
     article_type = ArticleType.audio
 
 
+@register
 class VideoContentGenerator(MediaContentGenerator):
     article_type = ArticleType.video
 
 
+@register
 class EmbeddedContentGenerator(ContentGenerator):
     article_type = ArticleType.embedded
+    needs_page = False
 
     @staticmethod
     def get_vector():
         return None
 
     def generate(self):
-        yt_match = YOUTUBE_RE.match(self.article.link)
+        yt_match = is_embedded_link(self.article.link)
         if yt_match:
             msg = "%r constructing embedded youtube content from article"
             logger.info(msg, self.article)
-            try:
-                return {"type": "youtube", "link": yt_match.group(5)}
-            except IndexError:
-                pass
-        else:
-            msg = "embedded media not recognized %r"
-            logger.warning(msg, self.article.link)
+            return {"type": "youtube", "link": yt_match.group(1)}
+        msg = "embedded media not recognized %r"
+        logger.warning(msg, self.article.link)
         return {}
 
 
 class TruncatedContentGenerator(ContentGenerator):
 
-    def generate(self):
-        if self._page is None:
+    @cached_property
+    def _fetched_content(self):
+        if not self._extract_attempted:
             self._get_goose()
         content = {"type": "fetched"}
         try:
@@ -148,33 +317,33 @@ class TruncatedContentGenerator(ContentGenerator):
         logger.debug("%r no special type found doing nothing", self.article)
         return content
 
+    def generate(self):
+        # copied, the returned content ends up merged into cluster content
+        return dict(self._fetched_content)
+
 
+@register
 class RedditContentGenerator(TruncatedContentGenerator):
     feed_type = FeedType.reddit
 
-    def __init__(self, article):
-        self._is_pure_reddit_post = None
-        super().__init__(article)
-
-    @property
+    @cached_property
     def is_pure_reddit_post(self):
-        if self._is_pure_reddit_post is not None:
-            return self._is_pure_reddit_post  # no re-computing
-        self._is_pure_reddit_post = False
         if self.article.article_type is not None:
-            return self._is_pure_reddit_post
+            return False
         try:
             split = urllib.parse.urlsplit(self.article.link)
             paths = split.path.strip("/").split("/")
-            if (
+            return (
                 "reddit.com" in split.netloc
                 and paths[0] == "r"
                 and paths[2] == "comments"
-            ):
-                self._is_pure_reddit_post = True
+            )
         except (AttributeError, IndexError):
-            pass
-        return self._is_pure_reddit_post
+            return False
+
+    @property
+    def needs_page(self):
+        return not self.is_pure_reddit_post and super().needs_page
 
     def get_vector(self):
         if not self.is_pure_reddit_post:
@@ -186,34 +355,27 @@ class RedditContentGenerator(TruncatedContentGenerator):
         return {}  # original reddit post, nothing to process
 
 
-CONTENT_GENERATORS = {}
-
+@lru_cache(maxsize=None)
+def _resolve_cls(article_type, feed_type, truncated_content):
+    if article_type and article_type in CONTENT_GENERATORS:
+        return CONTENT_GENERATORS[article_type]
 
-def feed_mapping(subcls_):
-    if subcls_.feed_type is not None:
-        CONTENT_GENERATORS[subcls_.feed_type] = subcls_
-    if subcls_.article_type is not None:
-        CONTENT_GENERATORS[subcls_.article_type] = subcls_
+    if feed_type and feed_type in CONTENT_GENERATORS:
+        return CONTENT_GENERATORS[feed_type]
 
+    if truncated_content:
+        return TruncatedContentGenerator
 
-for subcls in ContentGenerator.__subclasses__():
-    feed_mapping(subcls)
-    for subsubcls in subcls.__subclasses__():
-        feed_mapping(subsubcls)
+    return ContentGenerator
 
 
-@lru_cache()
 def get_content_generator(article):
-    if article.article_type and article.article_type in CONTENT_GENERATORS:
-        return CONTENT_GENERATORS[article.article_type](article)
-
-    if article.feed.feed_type and article.feed.feed_type in CONTENT_GENERATORS:
-        return CONTENT_GENERATORS[article.feed.feed_type](article)
-
-    if article.feed.truncated_content:
-        return TruncatedContentGenerator(article)
-
-    return ContentGenerator(article)
+    cls = _resolve_cls(
+        article.article_type,
+        article.feed.feed_type,
+        article.feed.truncated_content,
+    )
+    return cls(article)
 
 
 def migrate_content(content: dict):
@@ -111,14 +111,14 @@ class BaseJarrTest(TestCase):
         session.close()
         from jarr.api import get_cached_user
         from jarr.lib.clustering_af.vector import get_simple_vector
-        from jarr.lib.content_generator import get_content_generator
+        from jarr.lib.content_generator import get_goose
         from jarr.lib.html_parsing import get_soup
 
         for func in (
             get_cached_user,
             get_soup,
             get_simple_vector,
-            get_content_generator,
+            get_goose,
         ):
             func.cache_clear()
 
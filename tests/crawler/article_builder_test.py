@@ -43,10 +43,11 @@ class CrawlerMainTest(BaseJarrTest):
         self.assertEqual(2, cluster.content['v'])
         self.assertEqual(0, len(cluster.content['contents']))
 
+    @patch('jarr.lib.content_generator.jarr_get')
     @patch('jarr.lib.content_generator.TruncatedContentGenerator.get_vector')
     @patch('jarr.lib.content_generator.TruncatedContentGenerator.generate')
     def test_articles_with_enclosure_and_fetched_content(self, truncated_cnt,
-                                                         get_vector):
+                                                         get_vector, get):
         self._clean_objs()
         get_vector.return_value = None
         truncated_cnt.return_value = {'type': 'fetched',
@@ -77,3 +78,4 @@ class CrawlerMainTest(BaseJarrTest):
         self.assertEqual(2, cluster.content['v'])
         self.assertEqual(1, len(cluster.content['contents']))
         self.assertEqual('fetched', cluster.content['contents'][0]['type'])
+        self.assertEqual(1, get.call_count)
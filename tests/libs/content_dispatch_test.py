@@ -0,0 +1,43 @@
+import unittest
+
+from jarr.lib import content_generator as cg
+from jarr.lib.enums import ArticleType, FeedType
+from jarr.models.article import Article
+from jarr.models.feed import Feed
+
+
+class ContentDispatchTest(unittest.TestCase):
+
+    def test_registered_generators(self):
+        self.assertEqual({ArticleType.image: cg.ImageContentGenerator,
+                          ArticleType.audio: cg.AudioContentGenerator,
+                          ArticleType.video: cg.VideoContentGenerator,
+                          ArticleType.embedded: cg.EmbeddedContentGenerator,
+                          FeedType.reddit: cg.RedditContentGenerator},
+                         cg.CONTENT_GENERATORS)
+
+    @staticmethod
+    def get_article(feed_type=FeedType.classic, truncated_content=False,
+                    **kwargs):
+        feed = Feed(feed_type=feed_type, truncated_content=truncated_content)
+        return Article(link='https://example.com/article', feed=feed,
+                       **kwargs)
+
+    def test_get_content_generator(self):
+        for cls, article in (
+                (cg.ContentGenerator, self.get_article()),
+                (cg.TruncatedContentGenerator,
+                 self.get_article(truncated_content=True)),
+                (cg.RedditContentGenerator,
+                 self.get_article(FeedType.reddit, True)),
+                (cg.ImageContentGenerator,
+                 self.get_article(FeedType.reddit, True,
+                                  article_type=ArticleType.image))):
+            generator = cg.get_content_generator(article)
+            self.assertEqual(cls, generator.__class__)
+            self.assertIs(article, generator.article)
+
+    def test_fresh_generator_on_each_call(self):
+        article = self.get_article(truncated_content=True)
+        self.assertIsNot(cg.get_content_generator(article),
+                         cg.get_content_generator(article))
@@ -0,0 +1,218 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from advocate.exceptions import UnacceptableAddressException
+from requests import Response
+from requests.exceptions import HTTPError, Timeout
+from requests.utils import get_encoding_from_headers
+
+from jarr.lib import content_generator
+from jarr.lib.enums import ArticleType
+from jarr.models.article import Article
+
+LINK = 'https://www.pariszigzag.fr/les-plus-belles-boulangeries-de-paris'
+REDDIT_LINK = 'https://www.reddit.com/r/france/comments/redditid/blabla/'
+
+
+class FakeRedis:
+
+    def __init__(self):
+        self.values, self.expires = {}, {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key], self.expires[key] = value, ex
+
+
+class ContentExtractionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        module = 'jarr.lib.content_generator.'
+        self._redis_patch = patch(module + 'REDIS_CONN', self.redis)
+        self._redis_patch.start()
+        self._get_patch = patch(module + 'jarr_get')
+        self.jarr_get = self._get_patch.start()
+        self.jarr_get.return_value = self.get_response()
+
+    def tearDown(self):
+        self._redis_patch.stop()
+        self._get_patch.stop()
+
+    @staticmethod
+    def get_response(url=LINK, content=None):
+        if content is None:
+            with open('tests/fixtures/article.html', 'rb') as fd:
+                content = fd.read()
+        resp = Response()
+        resp.url, resp.status_code, resp._content = url, 200, content
+        resp.headers['content-type'] = 'text/html'  # no charset
+        # as requests does it, defaulting text/html to ISO-8859-1
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        return resp
+
+    @staticmethod
+    def get_generator(link=LINK, cls=None, **kwargs):
+        cls = cls or content_generator.TruncatedContentGenerator
+        return cls(Article(link=link, **kwargs))
+
+    def test_prefetched_page_is_extracted(self):
+        gen = self.get_generator()
+        content_generator.prefetch_pages([gen])
+        self.assertEqual(1, self.jarr_get.call_count)
+        self.assertFalse(gen.needs_page)
+
+        self.assertIsNotNone(gen.get_vector())
+        self.assertEqual('Les plus belles boulangeries de Paris',
+                         gen.extracted_infos['title'])
+        self.assertEqual('fetched', gen.generate()['type'])
+        self.assertIsNone(gen._raw_html)  # page released once parsed
+        self.assertEqual(1, self.jarr_get.call_count)
+
+    def test_page_charset_read_from_html(self):
+        title = 'Crème brûlée à Paris'
+        self.jarr_get.return_value = self.get_response(content=(
+            '<html><head><meta charset="utf-8"><title>%s</title></head>'
+            '<body><p>Une crème brûlée, à déguster.</p></body></html>'
+            % title).encode('utf8'))
+        gen = self.get_generator()
+        content_generator.prefetch_pages([gen])
+        gen.get_vector()
+        self.assertEqual(title, gen.extracted_infos['title'])
+        self.assertEqual(title, gen.generate()['title'])
+
+    def test_same_link_prefetched_once(self):
+        gens = [self.get_generator(), self.get_generator()]
+        content_generator.prefetch_pages(gens)
+        self.assertEqual(1, self.jarr_get.call_count)
+        self.assertFalse(any(gen.needs_page for gen in gens))
+        for gen in gens:
+            self.assertIsNotNone(gen.get_vector())
+            self.assertIsNone(gen._raw_html)
+        self.assertEqual(gens[0]._page, gens[1]._page)
+        self.assertEqual(1, self.jarr_get.call_count)
+
+    def test_failed_prefetch_falls_back(self):
+        self.jarr_get.side_effect = [Timeout(), self.get_response()]
+        gen = self.get_generator()
+        content_generator.prefetch_pages([gen])
+        self.assertEqual(1, self.jarr_get.call_count)
+        self.assertTrue(gen.needs_page)
+
+        self.assertIsNotNone(gen.get_vector())
+        self.assertEqual(2, self.jarr_get.call_count)
+
+    def test_empty_prefetched_page_not_fetched_again(self):
+        self.jarr_get.return_value = self.get_response(content=b'')
+        gen = self.get_generator()
+        content_generator.prefetch_pages([gen])
+        self.assertIsNone(gen.get_vector())
+        self.assertEqual({}, gen.generate())
+        self.assertEqual(1, self.jarr_get.call_count)
+
+    def test_refused_prefetch_is_not_fetched_again(self):
+        self.jarr_get.side_effect = UnacceptableAddressException()
+        gen = self.get_generator()
+        content_generator.prefetch_pages([gen])
+        self.assertIsNone(gen.get_vector())
+        self.assertEqual({}, gen.generate())
+        self.assertEqual(1, self.jarr_get.call_count)
+
+    def test_generators_not_needing_page(self):
+        gens = [
+            self.get_generator(
+                REDDIT_LINK,
+                cls=content_generator.RedditContentGenerator,
+                comments=REDDIT_LINK),
+            self.get_generator(cls=content_generator.ImageContentGenerator,
+                               article_type=ArticleType.image),
+            self.get_generator('https://youtu.be/scbrjaqM3Oc',
+                               cls=content_generator.EmbeddedContentGenerator,
+                               article_type=ArticleType.embedded),
+        ]
+        content_generator.prefetch_pages(gens)
+        self.assertEqual(0, self.jarr_get.call_count)
+
+    @patch('jarr.lib.content_generator.get_goose')
+    def test_extracted_tags(self, get_goose):
+        get_goose.return_value.extract.return_value = Mock(
+            opengraph={}, meta_lang='en', final_url=LINK, title='title',
+            meta_keywords='a, b,,c ', tags=['d', 'a'], cleaned_text='text',
+            top_node_raw_html='<p>text</p>')
+        infos, page = content_generator.extract(LINK, '<html></html>')
+        self.assertEqual({'a', 'b', 'c', 'd'}, infos['tags'])
+        self.assertEqual(['d', 'a'], page.tags)
+
+    def test_extraction_shared_through_redis(self):
+        gen = self.get_generator()
+        gen.get_vector()
+        key, = self.redis.values
+        self.assertEqual(content_generator.EXTRACT_EXPIRE,
+                         self.redis.expires[key])
+
+        other_gen = self.get_generator()
+        self.assertTrue(other_gen.load_extracted())
+        self.assertEqual(gen._page, other_gen._page)
+        self.assertIsInstance(other_gen._page, content_generator.ExtractedPage)
+        self.assertEqual(gen.extracted_infos, other_gen.extracted_infos)
+        self.assertIsInstance(other_gen.extracted_infos['tags'], set)
+        self.assertIsNotNone(other_gen.get_vector())
+        self.assertEqual(gen.generate(), other_gen.generate())
+        self.assertEqual(1, self.jarr_get.call_count)
+
+        # different link, not shared
+        self.assertFalse(self.get_generator(LINK + '/other').load_extracted())
+
+    @patch('jarr.lib.content_generator.EXTRACT_MAX_SIZE', 1024)
+    def test_large_extraction_not_shared(self):
+        gen = self.get_generator()
+        self.assertIsNotNone(gen.get_vector())
+        self.assertEqual({}, self.redis.values)
+        self.assertFalse(self.get_generator().load_extracted())
+
+    def test_failed_extraction_attempted_once(self):
+        self.jarr_get.side_effect = Timeout()
+        gen = self.get_generator()
+        self.assertIsNone(gen.get_vector())
+        self.assertEqual({}, gen.generate())
+        self.assertEqual(1, self.jarr_get.call_count)
+        # transient error, not shared with other articles
+        self.assertEqual({}, self.redis.values)
+        self.assertFalse(self.get_generator().load_extracted())
+
+    @patch('jarr.lib.content_generator.extract')
+    def test_failed_parsing_attempted_once(self, extract):
+        extract.return_value = None
+        gen = self.get_generator()
+        self.assertIsNone(gen.get_vector())
+        self.assertEqual({}, gen.generate())
+        self.assertEqual(1, extract.call_count)
+        self.assertEqual({}, self.redis.values)
+
+    def test_lasting_failure_shared_through_redis(self):
+        response = Mock(status_code=404)
+        response.raise_for_status.side_effect = HTTPError(response=response)
+        self.jarr_get.side_effect = None
+        self.jarr_get.return_value = response
+        gen = self.get_generator()
+        self.assertIsNone(gen.get_vector())
+        key, = self.redis.values
+        self.assertEqual(content_generator.EXTRACT_FAILED_EXPIRE,
+                         self.redis.expires[key])
+
+        other_gen = self.get_generator()
+        content_generator.prefetch_pages([other_gen])
+        self.assertIsNone(other_gen.get_vector())
+        self.assertEqual({}, other_gen.generate())
+        self.assertEqual(1, self.jarr_get.call_count)
+
+    def test_goose_shared_by_user_agent(self):
+        content_generator.get_goose.cache_clear()
+        goose = content_generator.get_goose('jarr')
+        self.assertIs(goose, content_generator.get_goose('jarr'))
+        self.assertEqual('jarr', goose.config.browser_user_agent)
+        self.assertIsNot(goose, content_generator.get_goose('other'))
+        content_generator.get_goose.cache_clear()
+        self.assertIsNot(goose, content_generator.get_goose('jarr'))
@@ -0,0 +1,25 @@
+import unittest
+
+from jarr.lib.content_generator import get_embedded_id, is_embedded_link
+
+
+class EmbeddedLinkTest(unittest.TestCase):
+
+    def test_youtube_links(self):
+        for link in ('https://www.youtube.com/watch?v=scbrjaqM3Oc',
+                     'http://m.youtube.com/watch?feature=share&v=scbrjaqM3Oc',
+                     'www.youtube.com/watch?v=scbrjaqM3Oc&list=PLB049A6AC',
+                     '//youtube.com/embed/scbrjaqM3Oc?start=42',
+                     'https://youtube.com/v/scbrjaqM3Oc',
+                     'https://youtu.be/scbrjaqM3Oc'):
+            self.assertTrue(is_embedded_link(link), link)
+            self.assertEqual('scbrjaqM3Oc', get_embedded_id(link))
+
+    def test_not_embedded_links(self):
+        for link in ('https://www.youtube.com/channel/UCOWsWZTiXkbvQvtWO9RA0',
+                     'https://www.youtube.com/playlist?list=PLB049A6ACE1D68F',
+                     'http://youtube.com/an_unsecure_video',
+                     'https://www.youtube.com/watch?v=tooshort',
+                     'https://example.com/watch?v=scbrjaqM3Oc'):
+            self.assertFalse(is_embedded_link(link), link)
+            self.assertIsNone(get_embedded_id(link))